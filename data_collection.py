@@ -5,12 +5,14 @@
 
 import pandas as pd
 import requests
+import aiohttp
+import asyncio
 import numpy as np
 from urllib.parse import urlparse
 import json
 import time
 import concurrent.futures
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -24,33 +26,15 @@ class PhishingDataCollector:
             'uci_phishing': 'https://archive.ics.uci.edu/ml/machine-learning-databases/00379/PhishingData.arff',
             'phishtank': 'https://data.phishtank.com/data/online-valid.json',
             'urlnet': 'https://github.com/mjain0/URLNet/raw/master/URLNet/data/benign_list.txt',
-            'kaggle_phishing': 'https://raw.githubusercontent.com/agarwalpooja/Phishing-Website-Detection/master/dataset.csv'
+            'kaggle_phishing': 'https://raw.githubusercontent.com/agarwalpooja/Phishing-Website-Detection/master/dataset.csv',
+            'tranco': 'https://tranco-list.eu/download/ZQ100000/100000'
         }
 
     def download_uci_phishing_data(self) -> pd.DataFrame:
         """下载UCI钓鱼网站数据集"""
         try:
-            url = 'https://archive.ics.uci.edu/ml/machine-learning-databases/00379/PhishingData.arff'
-            response = requests.get(url)
-
-            # 解析ARFF文件
-            lines = response.text.split('\n')
-            data_start = False
-            data = []
-
-            for line in lines:
-                if line.strip().startswith('@data'):
-                    data_start = True
-                    continue
-                if data_start and line.strip():
-                    # 处理每一行数据
-                    row = line.strip().split(',')
-                    data.append(row)
-
-            # 转换为DataFrame
-            df = pd.DataFrame(data)
-            logger.info(f"UCI数据集下载完成，共 {len(df)} 条记录")
-            return df
+            response = requests.get(self.datasets['uci_phishing'])
+            return self._parse_uci_phishing_data(response.text)
 
         except Exception as e:
             logger.error(f"下载UCI数据集失败: {e}")
@@ -59,25 +43,8 @@ class PhishingDataCollector:
     def download_phishtank_data(self, limit: int = 1000) -> pd.DataFrame:
         """下载PhishTank钓鱼网站数据"""
         try:
-            url = 'https://data.phishtank.com/data/online-valid.json'
-            response = requests.get(url)
-            data = response.json()
-
-            # 提取URL和其他信息
-            phishing_data = []
-            for item in data[:limit]:
-                phishing_data.append({
-                    'url': item.get('url'),
-                    'phish_id': item.get('phish_id'),
-                    'target': item.get('target'),
-                    'verified': item.get('verified'),
-                    'verification_time': item.get('verification_time'),
-                    'is_phishing': 1
-                })
-
-            df = pd.DataFrame(phishing_data)
-            logger.info(f"PhishTank数据集下载完成，共 {len(df)} 条记录")
-            return df
+            response = requests.get(self.datasets['phishtank'])
+            return self._parse_phishtank_data(response.text, limit)
 
         except Exception as e:
             logger.error(f"下载PhishTank数据集失败: {e}")
@@ -87,27 +54,94 @@ class PhishingDataCollector:
         """下载正常网站URL"""
         try:
             # 从Tranco列表获取正常网站
-            url = 'https://tranco-list.eu/download/ZQ100000/100000'
-            response = requests.get(url)
-
-            legitimate_urls = []
-            for line in response.text.strip().split('\n')[:5000]:  # 限制5000个正常网站
-                rank, domain = line.split(',')
-                legitimate_urls.append({
-                    'url': f'http://{domain}',
-                    'domain': domain,
-                    'rank': int(rank),
-                    'is_phishing': 0
-                })
-
-            df = pd.DataFrame(legitimate_urls)
-            logger.info(f"正常网站数据下载完成，共 {len(df)} 条记录")
-            return df
+            response = requests.get(self.datasets['tranco'])
+            return self._parse_legitimate_urls(response.text)
 
         except Exception as e:
             logger.error(f"下载正常网站数据失败: {e}")
             return pd.DataFrame()
 
+    async def download_all_async(self, phishtank_limit: int = 1000) -> List[pd.DataFrame]:
+        """并发下载UCI、PhishTank和正常网站数据集"""
+        timeout = aiohttp.ClientTimeout(total=300)
+        connector = aiohttp.TCPConnector(limit=10)
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            return await asyncio.gather(
+                self._download_async(session, 'uci_phishing', self._parse_uci_phishing_data, "UCI数据集"),
+                self._download_async(session, 'phishtank',
+                                     lambda text: self._parse_phishtank_data(text, phishtank_limit), "PhishTank数据集"),
+                self._download_async(session, 'tranco', self._parse_legitimate_urls, "正常网站数据")
+            )
+
+    async def _download_async(self, session: aiohttp.ClientSession, dataset: str,
+                              parser: Callable[[str], pd.DataFrame], name: str) -> pd.DataFrame:
+        """异步下载单个数据源并解析"""
+        try:
+            async with session.get(self.datasets[dataset]) as response:
+                text = await response.text()
+            return parser(text)
+
+        except Exception as e:
+            logger.error(f"下载{name}失败: {e}")
+            return pd.DataFrame()
+
+    def _parse_uci_phishing_data(self, text: str) -> pd.DataFrame:
+        """解析UCI数据集的ARFF文本"""
+        lines = text.split('\n')
+        data_start = False
+        data = []
+
+        for line in lines:
+            if line.strip().startswith('@data'):
+                data_start = True
+                continue
+            if data_start and line.strip():
+                # 处理每一行数据
+                row = line.strip().split(',')
+                data.append(row)
+
+        # 转换为DataFrame
+        df = pd.DataFrame(data)
+        logger.info(f"UCI数据集下载完成，共 {len(df)} 条记录")
+        return df
+
+    def _parse_phishtank_data(self, text: str, limit: int) -> pd.DataFrame:
+        """解析PhishTank的JSON数据"""
+        data = json.loads(text)
+
+        # 提取URL和其他信息
+        phishing_data = []
+        for item in data[:limit]:
+            phishing_data.append({
+                'url': item.get('url'),
+                'phish_id': item.get('phish_id'),
+                'target': item.get('target'),
+                'verified': item.get('verified'),
+                'verification_time': item.get('verification_time'),
+                'is_phishing': 1
+            })
+
+        df = pd.DataFrame(phishing_data)
+        logger.info(f"PhishTank数据集下载完成，共 {len(df)} 条记录")
+        return df
+
+    def _parse_legitimate_urls(self, text: str) -> pd.DataFrame:
+        """解析Tranco排名列表"""
+        legitimate_urls = []
+        for line in text.strip().split('\n')[:5000]:  # 限制5000个正常网站
+            rank, domain = line.split(',')
+            legitimate_urls.append({
+                'url': f'http://{domain}',
+                'domain': domain,
+                'rank': int(rank),
+                'is_phishing': 0
+            })
+
+        df = pd.DataFrame(legitimate_urls)
+        logger.info(f"正常网站数据下载完成，共 {len(df)} 条记录")
+        return df
+
     def generate_synthetic_features(self, url: str) -> Dict[str, Any]:
         """生成URL特征"""
         try:
@@ -209,10 +243,10 @@ class PhishingDataCollector:
         """收集并处理所有数据"""
         logger.info("开始收集钓鱼网站数据...")
 
-        # 下载各数据集
-        uci_data = self.download_uci_phishing_data()
-        phishtank_data = self.download_phishtank_data(limit=2000)
-        legitimate_data = self.download_legitimate_urls()
+        # 并发下载各数据集
+        uci_data, phishtank_data, legitimate_data = asyncio.run(
+            self.download_all_async(phishtank_limit=2000)
+        )
 
         # 合并数据
         all_data = []
@@ -264,7 +298,8 @@ class PhishingDataCollector:
 
         return stats
 
-if __name__ == "__main__":
+def main() -> bool:
+    """收集数据集并保存统计信息"""
     collector = PhishingDataCollector()
     dataset = collector.collect_and_process_data()
 
@@ -280,5 +315,10 @@ if __name__ == "__main__":
         print("✅ 数据收集完成!")
         print("📁 数据文件: phishing_dataset.csv")
         print("📊 统计信息: dataset_statistics.json")
-    else:
-        print("❌ 数据收集失败!")
\ No newline at end of file
+        return True
+
+    print("❌ 数据收集失败!")
+    return False
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,13 @@ import sys
 import os
 import time
 import tarfile
-import shutil
+import io
 
 def create_deployment_package():
     """创建部署包"""
     print("📦 创建部署包...")
 
-    # 创建临时目录
-    os.makedirs('/tmp/phishing_deploy', exist_ok=True)
-
-    # 复制必要文件
+    # 需要打包的文件
     files_to_copy = [
         'simple_app.py',
         'requirements.txt',
@@ -29,13 +26,6 @@ def create_deployment_package():
         'app/',
     ]
 
-    for item in files_to_copy:
-        if os.path.exists(item):
-            if os.path.isdir(item):
-                shutil.copytree(item, f'/tmp/phishing_deploy/{item}', dirs_exist_ok=True)
-            else:
-                shutil.copy2(item, '/tmp/phishing_deploy/')
-
     # 创建启动脚本
     startup_script = '''#!/bin/bash
 # 钓鱼网站检测器启动脚本
@@ -72,12 +62,19 @@ echo "Web应用: http://$(hostname -I | awk '{print $1}'):5000"
 echo "启动训练: python3 start_training.py"
 '''
 
-    with open('/tmp/phishing_deploy/startup.sh', 'w') as f:
-        f.write(startup_script)
-
-    # 创建tar包
+    # 直接从源码目录写入tar包，不再复制到临时目录
     with tarfile.open('/tmp/phishing_detector.tar.gz', 'w:gz') as tar:
-        tar.add('/tmp/phishing_deploy', arcname='phishing-detector')
+        for item in files_to_copy:
+            if os.path.exists(item):
+                tar.add(item, arcname=f"phishing-detector/{item.rstrip('/')}")
+
+        # 启动脚本在内存中生成后写入
+        script_bytes = startup_script.encode('utf-8')
+        info = tarfile.TarInfo('phishing-detector/startup.sh')
+        info.size = len(script_bytes)
+        info.mode = 0o755
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(script_bytes))
 
     print("✅ 部署包创建完成: /tmp/phishing_detector.tar.gz")
 
@@ -6,94 +6,151 @@ Deploy phishing detector to remote server using paramiko
 import paramiko
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ssh_pool import pool, run_command, run_script
+
+class GCMFirstTransport(paramiko.Transport):
+    """Transport that offers the AES-GCM ciphers ahead of the default order"""
+    # One AEAD pass replaces AES-CTR + HMAC when the server supports GCM;
+    # CTR and CBC stay in the list so negotiation can still fall back
+    _preferred_ciphers = (
+        tuple(c for c in paramiko.Transport._preferred_ciphers if "-gcm@" in c)
+        + tuple(c for c in paramiko.Transport._preferred_ciphers if "-gcm@" not in c)
+    )
+
+# Transport options for the bulk upload connection: zlib compression for the
+# textual files, and GCM preferred over the other ciphers
+TRANSPORT_OPTIONS = {
+    "compress": True,
+    "transport_factory": GCMFirstTransport,
+}
+
+def upload_files(ssh, remote_files):
+    """Upload (local_path, remote_path) pairs concurrently over one SSH connection"""
+    def upload(local_path, remote_path):
+        # Each file gets its own SFTP channel; put() pipelines its writes
+        sftp = ssh.open_sftp()
+        try:
+            sftp.put(local_path, remote_path)
+        finally:
+            sftp.close()
+
+    if not remote_files:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(remote_files)) as executor:
+        futures = [executor.submit(upload, local_path, remote_path)
+                   for local_path, remote_path in remote_files]
+        for future in futures:
+            future.result()
+
+def run_commands(ssh, command_groups):
+    """Run each named command list as one set -e script, groups concurrently"""
+    for name, commands in command_groups.items():
+        print(f"🔧 Executing {name} commands:")
+        for cmd in commands:
+            print(f"   {cmd}")
+
+    scripts = ["set -e\n" + "\n".join(commands) + "\n" for commands in command_groups.values()]
+    with ThreadPoolExecutor(max_workers=len(scripts)) as executor:
+        results = list(executor.map(lambda script: run_script(ssh, script), scripts))
+
+    for name, (exit_status, output, error) in zip(command_groups, results):
+        if output:
+            print(f"   [{name}] Output: {output.strip()}")
+        if error:
+            print(f"   [{name}] Error: {error.strip()}")
+        if exit_status != 0:
+            raise RuntimeError(f"{name} commands exited with status {exit_status}")
 
 def deploy_to_server():
     server = "192.168.1.246"
     username = "root"
-    password = "3646287"
 
-    # Commands to run on remote server
-    commands = [
+    # Each group is streamed to bash over stdin, so commands that may prompt
+    # read /dev/null instead and cannot swallow the rest of the script
+
+    # Commands to run first, in order
+    setup_commands = [
         # Update system and install dependencies
-        "apt update",
-        "apt install -y python3-pip python3-dev python3-venv mysql-server libmysqlclient-dev nginx supervisor",
+        "DEBIAN_FRONTEND=noninteractive apt update < /dev/null",
+        "DEBIAN_FRONTEND=noninteractive apt install -y"
+        " -o Dpkg::Options::=--force-confdef -o Dpkg::Options::=--force-confold"
+        " python3-pip python3-dev python3-venv mysql-server libmysqlclient-dev nginx supervisor < /dev/null",
 
         # Create application directory
-        "mkdir -p /opt/phishing-detector",
-        "cd /opt/phishing-detector",
-
-        # Create virtual environment
-        "python3 -m venv venv",
-        "source venv/bin/activate",
-
-        # Upgrade pip
-        "pip install --upgrade pip",
-
-        # Configure MySQL
-        "mysql -e 'CREATE DATABASE IF NOT EXISTS phishing_detector CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;'",
-        "mysql -e \"CREATE USER IF NOT EXISTS 'phishing_user'@'localhost' IDENTIFIED BY 'phishing_password';\"",
-        "mysql -e 'GRANT ALL PRIVILEGES ON phishing_detector.* TO '\\'phishing_user\\'@'\\'localhost\\';'",
-        "mysql -e 'FLUSH PRIVILEGES;'",
-
-        # Start MySQL service
-        "systemctl start mysql",
-        "systemctl enable mysql",
+        "mkdir -p /opt/phishing-detector/config",
     ]
 
+    # Independent command groups, run concurrently once setup is done
+    command_groups = {
+        "virtualenv": [
+            # Create virtual environment
+            "cd /opt/phishing-detector",
+            "python3 -m venv venv",
+            "source venv/bin/activate",
+
+            # Upgrade pip
+            "pip install --upgrade pip < /dev/null",
+        ],
+        "mysql": [
+            # Start MySQL service
+            "systemctl enable --now mysql < /dev/null",
+
+            # Configure MySQL
+            "mysql -e 'CREATE DATABASE IF NOT EXISTS phishing_detector CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;'",
+            "mysql -e \"CREATE USER IF NOT EXISTS 'phishing_user'@'localhost' IDENTIFIED BY 'phishing_password';\"",
+            "mysql -e \"GRANT ALL PRIVILEGES ON phishing_detector.* TO 'phishing_user'@'localhost';\"",
+            "mysql -e 'FLUSH PRIVILEGES;'",
+        ],
+    }
+
     print(f"=== Connecting to {server} ===")
 
     try:
-        # Create SSH client
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-        # Connect to server
-        ssh.connect(server, username=username, password=password)
-        print("✅ Connected to server")
-
-        # Execute commands
-        for cmd in commands:
-            print(f"🔧 Executing: {cmd}")
-            stdin, stdout, stderr = ssh.exec_command(cmd)
+        # Borrow a pooled SSH connection (connects on first use)
+        with pool.get(server, username, **TRANSPORT_OPTIONS) as ssh:
+            transport = ssh.get_transport()
+            print(f"✅ Connected to server ({transport.remote_cipher}, "
+                  f"compression {transport.remote_compression})")
+
+            # Execute setup commands in a single shell session
+            run_commands(ssh, {"setup": setup_commands})
+
+            # Run the independent groups concurrently over the same connection
+            run_commands(ssh, command_groups)
+
+            # Create SFTP client to transfer files
+            sftp = ssh.open_sftp()
+
+            # Create project structure on remote server
+            remote_files = [
+                ("requirements.txt", "/opt/phishing-detector/requirements.txt"),
+                ("config/settings.yaml", "/opt/phishing-detector/config/settings.yaml"),
+                ("simple_app.py", "/opt/phishing-detector/simple_app.py"),
+                ("wsgi.py", "/opt/phishing-detector/wsgi.py"),
+            ]
+
+            # Transfer files
+            remote_files = [(local_path, remote_path) for local_path, remote_path in remote_files
+                            if os.path.exists(local_path)]
+            for local_path, remote_path in remote_files:
+                print(f"📦 Transferring {local_path} -> {remote_path}")
+            upload_files(ssh, remote_files)
 
-            # Read output
-            output = stdout.read().decode()
-            error = stderr.read().decode()
+            # Install Python dependencies
+            print("🔧 Installing Python dependencies...")
+            exit_status, output, error = run_command(
+                ssh, "cd /opt/phishing-detector && source venv/bin/activate && pip install -r requirements.txt")
 
             if output:
                 print(f"   Output: {output.strip()}")
             if error:
                 print(f"   Error: {error.strip()}")
 
-        # Create SFTP client to transfer files
-        sftp = ssh.open_sftp()
-
-        # Create project structure on remote server
-        remote_files = [
-            ("requirements.txt", "/opt/phishing-detector/requirements.txt"),
-            ("config/settings.yaml", "/opt/phishing-detector/config/settings.yaml"),
-        ]
-
-        # Transfer files
-        for local_path, remote_path in remote_files:
-            if os.path.exists(local_path):
-                print(f"📦 Transferring {local_path} -> {remote_path}")
-                sftp.put(local_path, remote_path)
-
-        # Install Python dependencies
-        print("🔧 Installing Python dependencies...")
-        stdin, stdout, stderr = ssh.exec_command("cd /opt/phishing-detector && source venv/bin/activate && pip install -r requirements.txt")
-
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-
-        if output:
-            print(f"   Output: {output.strip()}")
-        if error:
-            print(f"   Error: {error.strip()}")
-
-        # Create systemd service
-        service_content = '''[Unit]
+            # Create systemd service
+            service_content = '''[Unit]
 Description=Phishing Detector API
 After=network.target mysql.service
 
@@ -102,30 +159,30 @@ Type=simple
 User=root
 WorkingDirectory=/opt/phishing-detector
 Environment=PATH=/opt/phishing-detector/venv/bin
-ExecStart=/opt/phishing-detector/venv/bin/python -m app.api.routes
+ExecStart=/opt/phishing-detector/venv/bin/gunicorn --preload -k gthread -w 4 --threads 4 -t 30 -b 0.0.0.0:5000 wsgi:application
 Restart=always
 RestartSec=10
 
 [Install]
 WantedBy=multi-user.target'''
 
-        # Write service file
-        sftp.putfo(ssh.open_sftp().file('/etc/systemd/system/phishing-detector.service', 'w'),
-                  service_content.encode())
-
-        # Enable and start service
-        print("🚀 Starting service...")
-        ssh.exec_command("systemctl daemon-reload")
-        ssh.exec_command("systemctl enable phishing-detector")
-        ssh.exec_command("systemctl start phishing-detector")
-
-        # Check service status
-        stdin, stdout, stderr = ssh.exec_command("systemctl status phishing-detector")
-        status = stdout.read().decode()
-        print(f"📊 Service Status:\n{status}")
+            # Write service file
+            with sftp.open('/etc/systemd/system/phishing-detector.service', 'w') as f:
+                f.set_pipelined(True)
+                f.write(service_content)
+
+            # Enable, start and check the service in one channel, waiting for it to finish
+            print("🚀 Starting service...")
+            exit_status, status, error = run_command(
+                ssh, "systemctl daemon-reload && systemctl enable --now phishing-detector"
+                     " && sleep 1 && systemctl status --no-pager phishing-detector")
+            print(f"📊 Service Status:\n{status}")
+            if error:
+                print(f"   Error: {error.strip()}")
+            if exit_status != 0:
+                raise RuntimeError(f"service start exited with status {exit_status}")
 
-        sftp.close()
-        ssh.close()
+            sftp.close()
 
         print("✅ Deployment completed successfully!")
 
@@ -141,7 +198,7 @@ if __name__ == "__main__":
         import paramiko
     except ImportError:
         print("Installing paramiko...")
-        os.system("pip install paramiko")
+        os.system("pip install 'paramiko>=3.3.0'")
         import paramiko
 
     deploy_to_server()
\ No newline at end of file
@@ -3,44 +3,24 @@
 Quick deployment script using SSH
 """
 
-import subprocess
 import sys
 import time
 
-def run_command(cmd, check=True):
-    """Run a command and return the result"""
-    print(f"Running: {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    if check and result.returncode != 0:
-        print(f"Error: {result.stderr}")
-        sys.exit(1)
-    return result
-
-def main():
-    server = "192.168.1.246"
-    user = "root"
-    password = "3646287"
+from ssh_pool import pool, run_script
 
-    print(f"=== Quick Deploy to {server} ===")
-
-    # Check if sshpass is available
-    try:
-        subprocess.run(["sshpass", "-V"], check=True, capture_output=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("Installing sshpass...")
-        run_command("brew install sshpass")
-
-    # Upload the setup script
-    print("Uploading setup script...")
-    with open('/tmp/setup_remote.sh', 'w') as f:
-        f.write('''#!/bin/bash
+# Setup script streamed to the remote shell over stdin
+SETUP_SCRIPT = '''#!/bin/bash
 # Setup script for remote server
 
 echo "=== Setting up Phishing Detector ==="
 
+# This script is bash's stdin, so anything that may prompt reads /dev/null
+# instead and cannot swallow the lines that follow
+
 # Install dependencies
-apt update
-apt install -y python3-pip python3-venv mysql-server
+DEBIAN_FRONTEND=noninteractive apt update < /dev/null
+DEBIAN_FRONTEND=noninteractive apt install -y -o Dpkg::Options::=--force-confdef -o Dpkg::Options::=--force-confold \\
+    python3-pip python3-venv mysql-server < /dev/null
 
 # Create application directory
 mkdir -p /opt/phishing-detector
@@ -51,7 +31,7 @@ python3 -m venv venv
 source venv/bin/activate
 
 # Install Python dependencies
-pip install flask flask-cors pyyaml requests beautifulsoup4
+pip install flask flask-cors pyyaml requests beautifulsoup4 gunicorn < /dev/null
 
 # Create simple application
 mkdir -p app/api
@@ -60,11 +40,26 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import yaml
 import re
-import urllib.parse
+import string
+import functools
+import ipaddress
+import unicodedata
 
 app = Flask(__name__)
 CORS(app)
 
+# Heuristic rules, compiled once at import time
+IP_ADDRESS_RE = re.compile(r'^\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}$')
+SPECIAL_CHARS = frozenset('@%_-+=')
+SUSPICIOUS_TLDS = ('.tk', '.ml', '.ga', '.cf', '.xyz', '.top', '.click', '.download')
+
+# URL characters as urlparse treats them
+SCHEME_CHARS = frozenset(string.ascii_letters + string.digits + '+-.')
+URL_STRIP_CHARS = ''.join(map(chr, range(0x21)))
+URL_UNSAFE_CHARS = frozenset('\\t\\r\\n')
+NETLOC_NFKC_SEPARATORS = frozenset('/?#@:')
+IPV_FUTURE_RE = re.compile(r'\\Av[a-fA-F0-9]+\\..+\\Z')
+
 @app.route('/')
 def index():
     return """
@@ -153,6 +148,93 @@ def health_check():
         'version': '1.0.0'
     })
 
+def _netloc(url):
+    """Slice the netloc out with str.find, same result as urlparse(url).netloc"""
+    url = url.lstrip(URL_STRIP_CHARS)
+    if not URL_UNSAFE_CHARS.isdisjoint(url):
+        for char in URL_UNSAFE_CHARS:
+            url = url.replace(char, '')
+
+    # Only a valid scheme before the first ':' is stripped, so a scheme-less
+    # URL such as evil.tk/?r=http://x@y.tk does not yield the embedded host
+    i = url.find(':')
+    if i > 0 and url[0].isascii() and url[0].isalpha() and SCHEME_CHARS.issuperset(url[:i]):
+        url = url[i + 1:]
+
+    if not url.startswith('//'):
+        return ''
+
+    netloc = url[2:]
+    for sep in '/?#':
+        j = netloc.find(sep)
+        if j >= 0:
+            netloc = netloc[:j]
+
+    _check_netloc(netloc)
+    return netloc
+
+def _check_netloc(netloc):
+    """The netloc validation urlsplit applies, raising ValueError the same way"""
+    if ('[' in netloc) != (']' in netloc):
+        raise ValueError("Invalid IPv6 URL")
+
+    # Only an IPv6 or IPvFuture address may sit inside brackets
+    if '[' in netloc:
+        host = netloc.partition('[')[2].partition(']')[0]
+        if host.startswith('v'):
+            if not IPV_FUTURE_RE.match(host):
+                raise ValueError("IPvFuture address is invalid")
+        elif not isinstance(ipaddress.ip_address(host), ipaddress.IPv6Address):
+            raise ValueError("An IPv4 address cannot be in brackets")
+
+    # Characters that NFKC-normalize to a separator (e.g. a fullwidth '#')
+    # would change the real host name
+    if not netloc.isascii():
+        n = netloc.replace('@', '').replace(':', '').replace('#', '').replace('?', '')
+        normalized = unicodedata.normalize('NFKC', n)
+        if normalized != n and not NETLOC_NFKC_SEPARATORS.isdisjoint(normalized):
+            raise ValueError("netloc contains invalid characters under NFKC normalization")
+
+@functools.lru_cache(maxsize=65536)
+def _score_url(url):
+    """Heuristic scoring, pure for a given URL so results are cached"""
+    domain = _netloc(url)
+
+    risk_score = 0
+    reasons = []
+
+    # Check URL length (cheapest checks run first)
+    if len(url) > 100:
+        risk_score += 0.1
+        reasons.append("Very long URL")
+
+    # Check for suspicious TLDs
+    if domain.endswith(SUSPICIOUS_TLDS):
+        risk_score += 0.2
+        reasons.append("Suspicious TLD")
+
+    # Check for IP address in URL
+    if IP_ADDRESS_RE.match(domain):
+        risk_score += 0.3
+        reasons.append("IP address in URL")
+
+    # Check for special characters (a dotted-quad IP never has any)
+    elif not SPECIAL_CHARS.isdisjoint(domain):
+        risk_score += 0.2
+        reasons.append("Special characters in domain")
+
+    # Determine result
+    is_phishing = risk_score > 0.5
+    confidence_score = min(risk_score, 1.0)
+
+    if is_phishing:
+        risk_level = "High" if confidence_score > 0.8 else "Medium"
+    else:
+        risk_level = "Low"
+
+    # Tuples keep the cached value hashable and safe to share across threads
+    return is_phishing, confidence_score, risk_level, tuple(reasons)
+
 @app.route('/api/detect', methods=['POST'])
 def detect_phishing():
     try:
@@ -163,48 +245,14 @@ def detect_phishing():
             return jsonify({'error': 'URL is required'}), 400
 
         # Simple heuristic-based detection
-        parsed = urllib.parse.urlparse(url)
-        domain = parsed.netloc
-
-        risk_score = 0
-        reasons = []
-
-        # Check for IP address in URL
-        if re.match(r'^\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}$', domain):
-            risk_score += 0.3
-            reasons.append("IP address in URL")
-
-        # Check for suspicious TLDs
-        suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.xyz', '.top', '.click', '.download']
-        if any(domain.endswith(tld) for tld in suspicious_tlds):
-            risk_score += 0.2
-            reasons.append("Suspicious TLD")
-
-        # Check URL length
-        if len(url) > 100:
-            risk_score += 0.1
-            reasons.append("Very long URL")
-
-        # Check for special characters
-        if re.search(r'[@%_\\-+=]', domain):
-            risk_score += 0.2
-            reasons.append("Special characters in domain")
-
-        # Determine result
-        is_phishing = risk_score > 0.5
-        confidence_score = min(risk_score, 1.0)
-
-        if is_phishing:
-            risk_level = "High" if confidence_score > 0.8 else "Medium"
-        else:
-            risk_level = "Low"
+        is_phishing, confidence_score, risk_level, reasons = _score_url(url)
 
         return jsonify({
             'url': url,
             'is_phishing': is_phishing,
             'confidence_score': confidence_score,
             'risk_level': risk_level,
-            'reasons': reasons,
+            'reasons': list(reasons),
             'detection_method': 'heuristic_analysis'
         })
 
@@ -212,9 +260,16 @@ def detect_phishing():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000)
 APP_EOF
 
+# WSGI entry point for gunicorn
+cat > wsgi.py << 'WSGI_EOF'
+from app.api.routes import app
+
+application = app
+WSGI_EOF
+
 # Create systemd service
 cat > /etc/systemd/system/phishing-detector.service << 'EOF'
 [Unit]
@@ -226,7 +281,7 @@ Type=simple
 User=root
 WorkingDirectory=/opt/phishing-detector
 Environment=PATH=/opt/phishing-detector/venv/bin
-ExecStart=/opt/phishing-detector/venv/bin/python app/api/routes.py
+ExecStart=/opt/phishing-detector/venv/bin/gunicorn --preload -k gthread -w 4 --threads 4 -t 30 -b 0.0.0.0:5000 wsgi:application
 Restart=always
 RestartSec=10
 
@@ -235,19 +290,28 @@ WantedBy=multi-user.target
 EOF
 
 # Start services
-systemctl daemon-reload
-systemctl enable phishing-detector
-systemctl start phishing-detector
+systemctl daemon-reload < /dev/null
+systemctl enable phishing-detector < /dev/null
+systemctl start phishing-detector < /dev/null
 
 echo "=== Setup Complete ==="
 echo "Application is running at: http://$(hostname -I | awk '{print $1}'):5000"
-''')
+'''
+
+def main():
+    server = "192.168.1.246"
+    user = "root"
 
-    # Upload and execute the script
-    print("Uploading and executing setup script...")
-    result = run_command(f'sshpass -p "{password}" scp -o StrictHostKeyChecking=no /tmp/setup_remote.sh {user}@{server}:/tmp/')
+    print(f"=== Quick Deploy to {server} ===")
 
-    result = run_command(f'sshpass -p "{password}" ssh -o StrictHostKeyChecking=no {user}@{server} "bash /tmp/setup_remote.sh"')
+    # Stream the setup script to a remote shell over a single SSH session
+    print("Executing setup script...")
+    with pool.get(server, user) as ssh:
+        exit_status, output, error = run_script(ssh, SETUP_SCRIPT)
+
+    if exit_status != 0:
+        print(f"Error: {error}")
+        sys.exit(1)
 
     print("=== Deployment Complete ===")
     print(f"Application should be accessible at: http://{server}:5000")
@@ -4,15 +4,101 @@
 """
 
 from flask import Flask, request, jsonify, render_template_string
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_caching import Cache
 import re
-import urllib.parse
+import string
+import ipaddress
+import unicodedata
 import time
 import random
+import itertools
+import functools
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """使用orjson处理请求解析和响应序列化"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
 CORS(app)
 
+# 进程内缓存: 主页和健康检查的响应内容固定，直接从缓存返回
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+# orjson可用时替换Flask默认的JSON实现，request.get_json()和jsonify同时生效
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# 模拟数据池: 启动时预生成 (置信度, 域名年龄, SSL有效) 元组，请求时按计数器轮询取用
+MOCK_POOL_SIZE = 4096  # 必须是2的幂
+MOCK_POOL = [
+    (random.uniform(0.8, 0.95), random.randint(1, 10), random.random() < 0.75)
+    for _ in range(MOCK_POOL_SIZE)
+]
+_mock_counter = itertools.count()
+
+def _response_template(risk_level, message, status):
+    """构建检测响应模板，风险等级相关的固定字段预先填好"""
+    return {
+        'url': '',
+        'risk_score': 0.0,
+        'confidence': 0.0,
+        'risk_level': risk_level,
+        'message': message,
+        'status': status,
+        'is_phishing': False,
+        'analysis_time': 0.0,
+        'features': None
+    }
+
+# 风险评分规则
+SUSPICIOUS_TLDS = ('.tk', '.ml', '.ga', '.cf', '.xyz', '.top', '.click', '.download')
+TRUSTED_DOMAINS = ('google.com', 'github.com', 'baidu.com', 'stackoverflow.com', 'microsoft.com', 'apple.com')
+# IP地址与特殊字符互斥（IP只含数字和点），合并为一个正则，一次扫描即可区分
+DOMAIN_PATTERN_RE = re.compile(r'(?P<ip>^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$)|(?P<special>[@%_\-+=])')
+DOMAIN_PATTERN_SCORES = {'ip': 0.4, 'special': 0.2}
+
+# 钓鱼关键词
+PHISHING_KEYWORDS = ('login', 'secure', 'verify', 'account', 'password', 'signin', 'banking')
+# 计入响应中 suspicious_patterns 的关键词
+SUSPICIOUS_PATTERN_KEYWORDS = frozenset(('login', 'secure', 'verify', 'account', 'password'))
+
+def _build_keyword_matcher():
+    """构建关键词多模式匹配器，所有请求共享（只读，无需加锁）"""
+    if ahocorasick is None:
+        pattern = re.compile('|'.join(PHISHING_KEYWORDS))
+        return lambda text: [m.group() for m in pattern.finditer(text)]
+
+    automaton = ahocorasick.Automaton()
+    for keyword in PHISHING_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return lambda text: [keyword for _, keyword in automaton.iter(text)]
+
+# 一次遍历找出文本中所有关键词出现（含重复）
+find_keywords = _build_keyword_matcher()
+
+# 检测响应模板: 请求时 copy() 后只填写可变字段
+LOW_RISK_RESPONSE = _response_template("低风险", "此网站看起来是安全的", "✅ 网站安全")
+MEDIUM_RISK_RESPONSE = _response_template("中风险", "此网站存在一些风险因素", "⚡ 存在风险")
+HIGH_RISK_RESPONSE = _response_template("高风险", "此网站可能是钓鱼网站", "⚠️ 钓鱼网站")
+
 # 完整的HTML模板
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -440,10 +526,12 @@ HTML_TEMPLATE = '''
 '''
 
 @app.route('/')
+@cache.cached(timeout=0)
 def index():
     return render_template_string(HTML_TEMPLATE)
 
 @app.route('/api/health')
+@cache.cached(timeout=1)
 def health_check():
     return jsonify({
         'status': 'healthy',
@@ -460,55 +548,105 @@ def detect_phishing():
         if not url:
             return jsonify({'error': 'URL是必需的'}), 400
 
+        # 评分结果按URL缓存，URL必须是可哈希的字符串
+        if not isinstance(url, str):
+            return jsonify({'error': 'URL必须是字符串'}), 400
+
         # 模拟分析延迟
         time.sleep(1)
 
         # 智能风险评分算法
         risk_score = calculate_risk_score(url)
-        confidence = random.uniform(0.8, 0.95)
+        confidence, domain_age, ssl_valid = MOCK_POOL[next(_mock_counter) & (MOCK_POOL_SIZE - 1)]
 
         # 确定风险等级和消息
         if risk_score < 0.3:
-            risk_level = "低风险"
-            message = "此网站看起来是安全的"
-            status = "✅ 网站安全"
+            response = LOW_RISK_RESPONSE.copy()
         elif risk_score < 0.6:
-            risk_level = "中风险"
-            message = "此网站存在一些风险因素"
-            status = "⚡ 存在风险"
+            response = MEDIUM_RISK_RESPONSE.copy()
         else:
-            risk_level = "高风险"
-            message = "此网站可能是钓鱼网站"
-            status = "⚠️ 钓鱼网站"
-
-        return jsonify({
-            'url': url,
-            'risk_score': risk_score,
-            'confidence': confidence,
-            'risk_level': risk_level,
-            'message': message,
-            'status': status,
-            'is_phishing': risk_score > 0.6,
-            'analysis_time': time.time(),
-            'features': {
-                'url_length': len(url),
-                'has_https': url.startswith('https://'),
-                'domain_age': random.randint(1, 10),
-                'ssl_valid': random.choice([True, True, True, False]),
-                'suspicious_patterns': len(re.findall(r'(login|secure|verify|account|password)', url.lower()))
-            }
-        })
+            response = HIGH_RISK_RESPONSE.copy()
+
+        response['url'] = url
+        response['risk_score'] = risk_score
+        response['confidence'] = confidence
+        response['is_phishing'] = risk_score > 0.6
+        response['analysis_time'] = time.time()
+        response['features'] = {
+            'url_length': len(url),
+            'has_https': url.startswith('https://'),
+            'domain_age': domain_age,
+            'ssl_valid': ssl_valid,
+            'suspicious_patterns': sum([keyword in SUSPICIOUS_PATTERN_KEYWORDS for keyword in find_keywords(url.lower())])
+        }
+
+        return jsonify(response)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# urlparse认可的scheme字符
+SCHEME_CHARS = frozenset(string.ascii_letters + string.digits + '+-.')
+# urlparse会去掉开头的控制字符和空格，并删除其中的制表符和换行
+URL_STRIP_CHARS = ''.join(map(chr, range(0x21)))
+URL_UNSAFE_CHARS = frozenset('\t\r\n')
+# netloc中NFKC规范化后不允许出现的分隔符（如全角＃、／），与urlsplit一致
+NETLOC_NFKC_SEPARATORS = frozenset('/?#@:')
+IPV_FUTURE_RE = re.compile(r'\Av[a-fA-F0-9]+\..+\Z')
+
+def extract_netloc(url):
+    """提取URL的netloc部分，与urlparse(url).netloc一致（netloc不合法时同样抛出ValueError）"""
+    url = url.lstrip(URL_STRIP_CHARS)
+    if not URL_UNSAFE_CHARS.isdisjoint(url):
+        for char in URL_UNSAFE_CHARS:
+            url = url.replace(char, '')
+
+    # 只有第一个冒号前是合法scheme时才去掉scheme，
+    # 否则 evil.tk/?next=https://google.com 这类无scheme的URL会取到查询参数里的域名
+    i = url.find(':')
+    if i > 0 and url[0].isascii() and url[0].isalpha() and SCHEME_CHARS.issuperset(url[:i]):
+        url = url[i + 1:]
+
+    if not url.startswith('//'):
+        return ''
+
+    netloc = url[2:]
+    for sep in '/?#':
+        j = netloc.find(sep)
+        if j >= 0:
+            netloc = netloc[:j]
+
+    check_netloc(netloc)
+    return netloc
+
+def check_netloc(netloc):
+    """与urlsplit相同的netloc合法性检查，不合法时抛出ValueError"""
+    if ('[' in netloc) != (']' in netloc):
+        raise ValueError("Invalid IPv6 URL")
+
+    # 方括号内只能是IPv6或IPvFuture地址
+    if '[' in netloc:
+        host = netloc.partition('[')[2].partition(']')[0]
+        if host.startswith('v'):
+            if not IPV_FUTURE_RE.match(host):
+                raise ValueError("IPvFuture address is invalid")
+        elif not isinstance(ipaddress.ip_address(host), ipaddress.IPv6Address):
+            raise ValueError("An IPv4 address cannot be in brackets")
+
+    # NFKC规范化后变成分隔符的字符（如 paypal.com＃.login.tk）会改变真实主机名
+    if not netloc.isascii():
+        n = netloc.replace('@', '').replace(':', '').replace('#', '').replace('?', '')
+        normalized = unicodedata.normalize('NFKC', n)
+        if normalized != n and not NETLOC_NFKC_SEPARATORS.isdisjoint(normalized):
+            raise ValueError("netloc contains invalid characters under NFKC normalization")
+
+@functools.lru_cache(maxsize=65536)
 def calculate_risk_score(url):
-    """计算URL风险评分"""
+    """计算URL风险评分（结果只取决于URL，按URL缓存）"""
     score = 0.1  # 基础分数
 
     try:
-        parsed = urllib.parse.urlparse(url)
-        domain = parsed.netloc
+        domain = extract_netloc(url)
 
         # URL长度风险
         if len(url) > 100:
@@ -521,26 +659,20 @@ def calculate_risk_score(url):
             score += 0.2
 
         # 可疑TLD
-        suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.xyz', '.top', '.click', '.download']
-        if any(domain.endswith(tld) for tld in suspicious_tlds):
+        if domain.endswith(SUSPICIOUS_TLDS):
             score += 0.3
 
-        # IP地址检查
-        if re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$', domain):
-            score += 0.4
-
-        # 特殊字符检查
-        if re.search(r'[@%_\-+=]', domain):
-            score += 0.2
+        # IP地址 / 特殊字符检查
+        match = DOMAIN_PATTERN_RE.search(domain)
+        if match:
+            score += DOMAIN_PATTERN_SCORES[match.lastgroup]
 
         # 钓鱼关键词检查
-        phishing_keywords = ['login', 'secure', 'verify', 'account', 'password', 'signin', 'banking']
-        keyword_count = sum(1 for keyword in phishing_keywords if keyword in url.lower())
+        keyword_count = len(set(find_keywords(url.lower())))
         score += min(keyword_count * 0.1, 0.3)
 
         # 知名域名降低风险
-        trusted_domains = ['google.com', 'github.com', 'baidu.com', 'stackoverflow.com', 'microsoft.com', 'apple.com']
-        if any(trusted in domain for trusted in trusted_domains):
+        if any(trusted in domain for trusted in TRUSTED_DOMAINS):
             score -= 0.2
 
         return max(0.0, min(1.0, score))
@@ -549,4 +681,5 @@ def calculate_risk_score(url):
         return 0.5
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9006, debug=True)
\ No newline at end of file
+    # 仅用于本地开发，生产环境使用 gunicorn 加载 wsgi:application
+    app.run(host='0.0.0.0', port=9006)
\ No newline at end of file
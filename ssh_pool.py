@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+SSH connection pool and remote script helper shared by the deploy scripts
+"""
+
+import atexit
+import os
+import select
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import paramiko
+
+# Private key used for every deploy connection; the server's key must already
+# be in ~/.ssh/known_hosts
+DEFAULT_KEY_FILE = os.path.expanduser("~/.ssh/id_ed25519")
+
+class SSHPool:
+    """Keeps authenticated SSHClients alive, keyed by (host, user)"""
+
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key):
+        """Pop an idle client whose transport is still active"""
+        with self._lock:
+            idle = self._pools.setdefault(key, deque())
+            while idle:
+                ssh = idle.pop()
+                transport = ssh.get_transport()
+                if transport is not None and transport.is_active():
+                    return ssh
+                ssh.close()
+        return None
+
+    @contextmanager
+    def get(self, host, user, key_file=DEFAULT_KEY_FILE, **connect_kwargs):
+        """Borrow a connected SSHClient, returning it to the pool on exit"""
+        key = (host, user)
+        ssh = self._acquire(key)
+
+        if ssh is None:
+            ssh = paramiko.SSHClient()
+            ssh.load_system_host_keys()
+            ssh.set_missing_host_key_policy(paramiko.RejectPolicy())
+            pkey = paramiko.Ed25519Key.from_private_key_file(key_file)
+            ssh.connect(host, username=user, pkey=pkey,
+                        allow_agent=False, look_for_keys=False, **connect_kwargs)
+
+        try:
+            yield ssh
+        except Exception:
+            ssh.close()
+            raise
+
+        with self._lock:
+            self._pools[key].append(ssh)
+
+    def close_all(self):
+        """Close every pooled connection"""
+        with self._lock:
+            for idle in self._pools.values():
+                while idle:
+                    idle.pop().close()
+            self._pools.clear()
+
+pool = SSHPool()
+atexit.register(pool.close_all)
+
+def _drain(channel):
+    """Read stdout and stderr together until the remote command exits"""
+    output, error = [], []
+    while not channel.exit_status_ready() or channel.recv_ready() or channel.recv_stderr_ready():
+        # The channel's fileno becomes readable when either stream has data
+        select.select([channel], [], [], 1.0)
+        if channel.recv_ready():
+            output.append(channel.recv(65536))
+        if channel.recv_stderr_ready():
+            error.append(channel.recv_stderr(65536))
+
+    exit_status = channel.recv_exit_status()
+    return exit_status, b"".join(output).decode(), b"".join(error).decode()
+
+def run_command(ssh, command):
+    """Run a single remote command, return (exit_status, stdout, stderr)"""
+    stdin, stdout, stderr = ssh.exec_command(command, get_pty=False)
+    stdin.channel.shutdown_write()
+    return _drain(stdout.channel)
+
+def run_script(ssh, script):
+    """Run a script in one remote bash session, return (exit_status, stdout, stderr)"""
+    stdin, stdout, stderr = ssh.exec_command("bash -s", get_pty=False)
+    stdin.write(script)
+    stdin.channel.shutdown_write()
+    return _drain(stdout.channel)
@@ -5,6 +5,10 @@
 
 import subprocess
 import sys
+import importlib.util
+import importlib.metadata
+import hashlib
+import platform
 import os
 import time
 import json
@@ -17,44 +21,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# GPU探测结果缓存
+GPU_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'phishing-detector', 'gpu.json')
+GPU_CACHE_TTL = 24 * 3600  # 秒
+
 def check_dependencies():
     """检查依赖项"""
     logger.info("检查依赖项...")
 
-    required_packages = [
-        'torch', 'torchvision', 'pandas', 'numpy', 'scikit-learn',
-        'matplotlib', 'seaborn', 'requests', 'tqdm', 'transformers'
-    ]
+    # pip包名 -> 导入模块名
+    required_packages = {
+        'torch': 'torch',
+        'torchvision': 'torchvision',
+        'pandas': 'pandas',
+        'numpy': 'numpy',
+        'scikit-learn': 'sklearn',
+        'matplotlib': 'matplotlib',
+        'seaborn': 'seaborn',
+        'requests': 'requests',
+        'tqdm': 'tqdm',
+        'transformers': 'transformers'
+    }
 
     missing_packages = []
 
-    for package in required_packages:
-        try:
-            __import__(package)
+    # 只查找模块规格，不执行模块的导入代码
+    for package, module in required_packages.items():
+        if importlib.util.find_spec(module) is not None:
             logger.info(f"✅ {package}")
-        except ImportError:
+        else:
             logger.error(f"❌ {package} 未安装")
             missing_packages.append(package)
 
     if missing_packages:
         logger.info("安装缺失的依赖项...")
-        for package in missing_packages:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
+        subprocess.check_call([
+            sys.executable, '-m', 'pip', 'install', '--disable-pip-version-check', *missing_packages
+        ])
 
     logger.info("✅ 依赖项检查完成")
 
+def _load_gpu_cache(key):
+    """读取未过期且key匹配的GPU探测缓存，否则返回None"""
+    try:
+        with open(GPU_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('key') != key or time.time() - cached.get('time', 0) > GPU_CACHE_TTL:
+        return None
+    return cached['devices']
+
+def _probe_gpu():
+    """导入torch并探测GPU，返回 [(设备名, 显存GB), ...]"""
+    import torch
+
+    if not torch.cuda.is_available():
+        return []
+    return [
+        (torch.cuda.get_device_name(i), torch.cuda.get_device_properties(i).total_memory / 1e9)
+        for i in range(torch.cuda.device_count())
+    ]
+
 def check_gpu():
-    """检查GPU"""
+    """检查GPU（结果按torch版本和主机名缓存一天）"""
     logger.info("检查GPU...")
 
     try:
-        import torch
-        if torch.cuda.is_available():
-            device_count = torch.cuda.device_count()
-            logger.info(f"✅ 找到 {device_count} 个GPU")
-            for i in range(device_count):
-                device_name = torch.cuda.get_device_name(i)
-                device_memory = torch.cuda.get_device_properties(i).total_memory / 1e9
+        # 从包元数据读取版本，缓存命中时无需导入torch
+        torch_version = importlib.metadata.version('torch')
+        key = hashlib.sha1((torch_version + platform.node()).encode()).hexdigest()
+
+        devices = _load_gpu_cache(key)
+        if devices is None:
+            devices = _probe_gpu()
+            os.makedirs(os.path.dirname(GPU_CACHE_FILE), exist_ok=True)
+            with open(GPU_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'time': time.time(), 'devices': devices}, f)
+        else:
+            logger.info("使用缓存的GPU探测结果")
+
+        if devices:
+            logger.info(f"✅ 找到 {len(devices)} 个GPU")
+            for i, (device_name, device_memory) in enumerate(devices):
                 logger.info(f"   GPU {i}: {device_name} ({device_memory:.1f} GB)")
         else:
             logger.warning("⚠️ 未找到GPU，将使用CPU训练")
@@ -70,14 +120,14 @@ def collect_data():
         return True
 
     try:
-        # 运行数据收集脚本
-        result = subprocess.run([sys.executable, 'data_collection.py'], capture_output=True, text=True)
+        # 在当前进程中运行数据收集（各数据源并发下载）
+        from data_collection import main as run_data_collection
 
-        if result.returncode == 0:
+        if run_data_collection():
             logger.info("✅ 数据收集完成")
             return True
         else:
-            logger.error(f"❌ 数据收集失败: {result.stderr}")
+            logger.error("❌ 数据收集失败")
             return False
 
     except Exception as e:
@@ -98,7 +148,7 @@ def train_model():
         train_args = [
             sys.executable, 'train_model.py',
             '--data', 'phishing_dataset.csv',
-            '--batch_size', '64',
+            '--batch_size', '256',
             '--epochs', '100',
             '--lr', '0.001',
             '--save_model', 'best_model.pth'
@@ -106,15 +156,24 @@ def train_model():
 
         logger.info(f"训练命令: {' '.join(train_args)}")
 
-        # 运行训练
-        result = subprocess.run(train_args, capture_output=True, text=True)
-
-        if result.returncode == 0:
+        # 运行训练，逐行转发子进程输出（stderr合并到stdout）
+        proc = subprocess.Popen(
+            train_args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            env={**os.environ, 'PYTHONUNBUFFERED': '1'}
+        )
+        for line in proc.stdout:
+            logger.info(f"[train] {line.rstrip()}")
+        returncode = proc.wait()
+
+        if returncode == 0:
             logger.info("✅ 模型训练完成")
-            logger.info(f"训练输出: {result.stdout}")
             return True
         else:
-            logger.error(f"❌ 模型训练失败: {result.stderr}")
+            logger.error(f"❌ 模型训练失败，退出码: {returncode}")
             return False
 
     except Exception as e:
@@ -134,8 +193,11 @@ def validate_training():
 
     missing_files = []
 
+    # 一次目录扫描取得所有文件名，代替逐个stat
+    present_files = {entry.name for entry in os.scandir('.')}
+
     for file_path in required_files:
-        if os.path.exists(file_path):
+        if file_path in present_files:
             logger.info(f"✅ {file_path}")
         else:
             logger.error(f"❌ {file_path} 不存在")
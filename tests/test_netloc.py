@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+extract_netloc 与 urlparse(url).netloc 的一致性检查
+
+运行: python -m unittest discover tests
+"""
+
+import unittest
+from urllib.parse import urlparse
+
+from simple_app import extract_netloc
+
+URLS = [
+    # 带scheme
+    'https://google.com/login',
+    'http://u@h.tk:1/path?q=1#f',
+    'HTTP://A.tk:80/p',
+    'a+b-c.d://host?q',
+    'mailto://a@b',
+    'http://a?b/c',
+    'http://a#frag?x',
+    'http://[::1]:80/',
+    '//a.b/c',
+    # 无scheme
+    'google.com',
+    'evil.tk/login',
+    'x.tk:8080//y',
+    'http:x.tk',
+    '',
+    ':',
+    '://x',
+    '[::1',
+    # 查询参数或路径里嵌入了URL
+    'evil.tk/login?next=https://google.com',
+    'paypal.tk/a?u=http://apple.com',
+    'evil.tk?r=http://x@y.tk',
+    'evil.tk/#//google.com',
+    '1http://x.tk',
+    'a_b://x.tk',
+    # 开头空白和其中的制表符、换行
+    '  https://x.tk',
+    'ht\ttps://x.tk',
+    'https://x\n.tk',
+    # NFKC规范化后出现分隔符的非ASCII字符，以及方括号内的非IPv6主机
+    'http://google.com／.evil.tk',
+    'http://paypal.com＃.login.tk/verify',
+    'http://ｐａｙｐａｌ.com/login',
+    'http://[github.com].tk',
+    'http://[127.0.0.1]/',
+    'http://[v1.fe]/',
+    'http://[vz.fe]/',
+]
+
+INVALID_URLS = [
+    'http://[::1',
+    'http://::1]/',
+    'http://google.com／.evil.tk',
+    'http://paypal.com＃.login.tk/verify',
+    'http://[github.com].tk',
+    'http://[127.0.0.1]/',
+]
+
+def parse_netloc(parse, url):
+    """返回netloc，解析抛出ValueError时返回ValueError"""
+    try:
+        return parse(url)
+    except ValueError:
+        return ValueError
+
+class ExtractNetlocTest(unittest.TestCase):
+
+    def test_matches_urlparse(self):
+        for url in URLS:
+            with self.subTest(url=url):
+                self.assertEqual(parse_netloc(extract_netloc, url),
+                                 parse_netloc(lambda u: urlparse(u).netloc, url))
+
+    def test_invalid_netloc_raises(self):
+        for url in INVALID_URLS:
+            with self.subTest(url=url):
+                self.assertRaises(ValueError, urlparse, url)
+                self.assertRaises(ValueError, extract_netloc, url)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+DataProcessor.preprocess_data 与 sklearn StandardScaler 的一致性检查
+
+运行: python -m unittest discover tests
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from train_model import DataProcessor
+
+def make_frame(n_samples=1000, seed=0):
+    """构造含常量列和0/1标志列的数据集"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'url_length': rng.normal(60, 25, n_samples),
+        'num_dots': rng.integers(0, 8, n_samples).astype(float),
+        'has_ip_address': np.zeros(n_samples),  # 训练集中全为0的标志
+        'is_shortened_url': (rng.random(n_samples) < 0.1).astype(float),
+        'constant_value': np.full(n_samples, 1000.1),  # float32无法精确表示的常量
+        'is_phishing': rng.integers(0, 2, n_samples),
+    })
+
+class PreprocessScalerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.df = make_frame()
+        self.processor = DataProcessor()
+        self.X, _ = self.processor.preprocess_data(self.df)
+
+        features = self.df[self.processor.feature_columns].to_numpy(dtype=np.float32)
+        self.scaler = StandardScaler().fit(features)
+        self.expected = self.scaler.transform(features)
+
+    def test_matches_standard_scaler(self):
+        np.testing.assert_allclose(self.X, self.expected, atol=1e-5)
+        np.testing.assert_allclose(self.processor.mean.cpu().numpy()[0], self.scaler.mean_, rtol=1e-6)
+        np.testing.assert_allclose(self.processor.std.cpu().numpy()[0], self.scaler.scale_, rtol=1e-6)
+
+    def test_constant_columns_use_unit_scale(self):
+        std = self.processor.std.cpu().numpy()[0]
+        for column in ['has_ip_address', 'constant_value']:
+            with self.subTest(column=column):
+                i = self.processor.feature_columns.index(column)
+                self.assertEqual(std[i], 1.0)
+                np.testing.assert_array_equal(self.X[:, i], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,9 @@
 """
 钓鱼网站检测器训练脚本
 针对4090显卡优化
+
+单卡: python train_model.py --data phishing_dataset.csv
+多卡: torchrun --nproc_per_node=N train_model.py --data phishing_dataset.csv
 """
 
 import pandas as pd
@@ -9,18 +12,21 @@ import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
+import torch.distributed as dist
 from torch.utils.data import DataLoader, Dataset
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+from torch.utils.data.distributed import DistributedSampler
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+import matplotlib
+matplotlib.use('Agg')  # 只保存图片，不需要交互式后端
 import matplotlib.pyplot as plt
-import seaborn as sns
 import json
+import os
 import time
 import logging
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import argparse
-from training_config import TrainingConfig, Trainer, AdvancedPhishingDetector, PhishingDataset
+from training_config import (TrainingConfig, Trainer, AdvancedPhishingDetector, PhishingDataset,
+                             GPUTensorLoader, FEATURE_GROUPS, DEVICE, NUM_WORKERS)
 
 # 设置日志
 logging.basicConfig(
@@ -33,12 +39,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 预处理缓存格式版本，标准化方式变化时递增，使旧缓存失效
+CACHE_VERSION = 2
+
+@torch.jit.script
+def standardize(x: torch.Tensor, mean: torch.Tensor, std: torch.Tensor) -> torch.Tensor:
+    """融合的逐元素标准化 (x - mean) / std"""
+    return (x - mean) / std
+
+def _stratified_split(y: np.ndarray, frac: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """分层随机划分，每个类别各取frac比例，返回 (保留部分索引, 划出部分索引)"""
+    keep, split = [], []
+    for label in np.unique(y):
+        idx = rng.permutation(np.flatnonzero(y == label))
+        n_split = int(round(frac * len(idx)))
+        split.append(idx[:n_split])
+        keep.append(idx[n_split:])
+
+    # 打乱类别顺序，使各部分中正负样本交错
+    return rng.permutation(np.concatenate(keep)), rng.permutation(np.concatenate(split))
+
 class DataProcessor:
     """数据处理器"""
 
     def __init__(self):
-        self.scaler = StandardScaler()
         self.feature_columns = []
+        # 标准化参数，推理时复用
+        self.mean = None
+        self.std = None
 
     def load_data(self, filepath: str) -> pd.DataFrame:
         """加载数据"""
@@ -64,14 +92,20 @@ class DataProcessor:
         self.feature_columns = feature_columns
 
         # 提取特征和标签
-        X = df[feature_columns].values
+        X = df[feature_columns].to_numpy(dtype=np.float32)
         y = df['is_phishing'].values
 
-        # 处理缺失值
-        X = np.nan_to_num(X)
-
-        # 标准化
-        X = self.scaler.fit_transform(X)
+        # 缺失值处理和标准化在GPU上完成，与StandardScaler一致：
+        # 均值和总体方差用float64计算，方差在舍入误差以内的常量列缩放系数取1
+        Xt = torch.nan_to_num(torch.from_numpy(X).to(DEVICE))
+        X64 = Xt.double()
+        mean = X64.mean(0, keepdim=True)
+        var = X64.var(0, unbiased=False, keepdim=True)
+        n_samples, eps = X64.shape[0], torch.finfo(torch.float64).eps
+        constant = var <= n_samples * eps * var + (n_samples * mean * eps) ** 2
+        self.mean = mean.float()
+        self.std = torch.where(constant, torch.ones_like(var), var.sqrt()).float()
+        X = standardize(Xt, self.mean, self.std).cpu().numpy()
 
         logger.info(f"特征数量: {X.shape[1]}")
         logger.info(f"样本数量: {X.shape[0]}")
@@ -79,17 +113,56 @@ class DataProcessor:
 
         return X, y
 
+    def save_scaler(self, filepath: str):
+        """保存标准化参数，供推理时使用"""
+        torch.save({
+            'feature_columns': self.feature_columns,
+            'mean': self.mean.cpu(),
+            'std': self.std.cpu()
+        }, filepath)
+
+    def load_cache(self, filepath: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """读取预处理缓存 <数据文件>.pre.pt，缓存不存在、早于数据文件或版本不符时返回None"""
+        cache_path = filepath + '.pre.pt'
+        if not os.path.exists(cache_path) or os.path.getmtime(cache_path) <= os.path.getmtime(filepath):
+            return None
+
+        cached = torch.load(cache_path)
+        if cached.get('version') != CACHE_VERSION:
+            return None
+
+        self.feature_columns = cached['cols']
+        self.mean = cached['mu']
+        self.std = cached['sd']
+        logger.info(f"使用预处理缓存: {cache_path}")
+        return cached['X'].numpy(), cached['y'].numpy()
+
+    def save_cache(self, filepath: str, X: np.ndarray, y: np.ndarray):
+        """保存标准化后的特征和标签，下次训练跳过加载和预处理"""
+        cache_path = filepath + '.pre.pt'
+        tmp_path = cache_path + '.tmp'
+        torch.save({
+            'X': torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)),
+            'y': torch.from_numpy(np.asarray(y, dtype=np.int64)),
+            'mu': self.mean.cpu(),
+            'sd': self.std.cpu(),
+            'cols': self.feature_columns,
+            'version': CACHE_VERSION
+        }, tmp_path)
+        # 写完再替换，避免其他进程读到不完整的缓存
+        os.replace(tmp_path, cache_path)
+
     def split_data(self, X: np.ndarray, y: np.ndarray, test_size: float = 0.2, val_size: float = 0.1) -> Tuple:
         """分割数据"""
-        # 先分割出测试集
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=42, stratify=y
-        )
+        rng = np.random.default_rng(42)
 
-        # 再从训练集分割出验证集
-        X_train, X_val, y_train, y_val = train_test_split(
-            X_train, y_train, test_size=val_size/(1-test_size), random_state=42, stratify=y_train
-        )
+        # 先分割出测试集，再从剩余部分分割出验证集（只操作索引，最后各取一次数据）
+        rest_idx, test_idx = _stratified_split(y, test_size, rng)
+        train_pos, val_pos = _stratified_split(y[rest_idx], val_size / (1 - test_size), rng)
+        train_idx, val_idx = rest_idx[train_pos], rest_idx[val_pos]
+
+        X_train, X_val, X_test = X[train_idx], X[val_idx], X[test_idx]
+        y_train, y_val, y_test = y[train_idx], y[val_idx], y[test_idx]
 
         logger.info(f"训练集: {X_train.shape[0]} 样本")
         logger.info(f"验证集: {X_val.shape[0]} 样本")
@@ -97,19 +170,22 @@ class DataProcessor:
 
         return X_train, X_val, X_test, y_train, y_val, y_test
 
-    def create_features_dict(self, X: np.ndarray) -> List[Dict[str, Any]]:
-        """创建特征字典"""
-        features = []
+    def pad_features(self, X: np.ndarray) -> np.ndarray:
+        """按特征分组补零，使每组宽度为8的倍数"""
+        groups = []
+        start = 0
+        for width, padded_width in FEATURE_GROUPS.values():
+            group = X[:, start:start + width]
+            groups.append(np.pad(group, ((0, 0), (0, padded_width - group.shape[1]))))
+            start += width
 
-        for i in range(X.shape[0]):
-            # 将特征分成不同的组
-            features.append({
-                'url_features': X[i, :50].tolist(),  # URL特征
-                'html_features': X[i, 50:150].tolist(),  # HTML特征
-                'ssl_features': X[i, 150:170].tolist()  # SSL特征
-            })
+        return np.concatenate(groups, axis=1)
 
-        return features
+    def to_tensors(self, X: np.ndarray, y: np.ndarray,
+                   dtype: torch.dtype = torch.float32) -> Tuple[torch.Tensor, torch.Tensor]:
+        """补零后转为连续的特征张量（默认float32，可降为bfloat16存储）和int64标签张量"""
+        X = np.ascontiguousarray(self.pad_features(X), dtype=np.float32)
+        return torch.from_numpy(X).to(dtype), torch.from_numpy(y.astype(np.int64))
 
 class ModelEvaluator:
     """模型评估器"""
@@ -117,8 +193,9 @@ class ModelEvaluator:
     def __init__(self):
         self.metrics = {}
 
-    def evaluate_model(self, model: nn.Module, test_loader: DataLoader, device: torch.device) -> Dict[str, float]:
-        """评估模型"""
+    def evaluate_model(self, model: nn.Module, test_loader: DataLoader,
+                       device: torch.device) -> Tuple[Dict[str, float], np.ndarray, np.ndarray, np.ndarray]:
+        """评估模型，返回 (指标, 真实标签, 预测标签, 正类概率)"""
         model.eval()
         all_predictions = []
         all_labels = []
@@ -126,18 +203,24 @@ class ModelEvaluator:
 
         with torch.no_grad():
             for batch in test_loader:
-                url_features = batch['url_features'].to(device)
-                html_features = batch['html_features'].to(device)
-                ssl_features = batch['ssl_features'].to(device)
-                labels = batch['label'].to(device)
+                # 按存储精度拷贝到设备后再转为float32
+                url_features = batch['url_features'].to(device, non_blocking=True).float()
+                html_features = batch['html_features'].to(device, non_blocking=True).float()
+                ssl_features = batch['ssl_features'].to(device, non_blocking=True).float()
+                labels = batch['label'].to(device, non_blocking=True)
 
                 outputs = model(url_features, html_features, ssl_features)
                 probabilities = torch.softmax(outputs, dim=1)[:, 1]
                 _, predicted = torch.max(outputs, 1)
 
-                all_predictions.extend(predicted.cpu().numpy())
-                all_labels.extend(labels.cpu().numpy())
-                all_probabilities.extend(probabilities.cpu().numpy())
+                # 结果留在设备上，循环结束后一次性拷回，避免每个批次同步
+                all_predictions.append(predicted)
+                all_labels.append(labels)
+                all_probabilities.append(probabilities)
+
+        all_predictions = torch.cat(all_predictions).cpu().numpy()
+        all_labels = torch.cat(all_labels).cpu().numpy()
+        all_probabilities = torch.cat(all_probabilities).float().cpu().numpy()
 
         # 计算评估指标
         metrics = {
@@ -149,10 +232,11 @@ class ModelEvaluator:
         }
 
         self.metrics = metrics
-        return metrics
+        return metrics, all_labels, all_predictions, all_probabilities
 
     def plot_confusion_matrix(self, y_true: np.ndarray, y_pred: np.ndarray):
         """绘制混淆矩阵"""
+        import seaborn as sns
         from sklearn.metrics import confusion_matrix
         cm = confusion_matrix(y_true, y_pred)
 
@@ -185,15 +269,41 @@ class ModelEvaluator:
 def main():
     parser = argparse.ArgumentParser(description='钓鱼网站检测器训练')
     parser.add_argument('--data', type=str, default='phishing_dataset.csv', help='数据文件路径')
-    parser.add_argument('--batch_size', type=int, default=64, help='批次大小')
+    parser.add_argument('--batch_size', type=int, default=256, help='批次大小')
     parser.add_argument('--epochs', type=int, default=100, help='训练轮数')
     parser.add_argument('--lr', type=float, default=0.001, help='学习率')
     parser.add_argument('--save_model', type=str, default='best_model.pth', help='模型保存路径')
+    parser.add_argument('--no-plots', action='store_true', help='不生成混淆矩阵和ROC曲线图')
+    parser.add_argument('--fp32-cache', action='store_true', help='特征张量保持float32存储（调试用）')
+    parser.add_argument('--loader', choices=['gpu', 'torch'], default='gpu',
+                        help='数据加载方式: gpu=数据常驻显存, torch=DataLoader（数据集超出显存时使用）')
 
     args = parser.parse_args()
 
+    # torchrun为每个进程设置 WORLD_SIZE / LOCAL_RANK
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    rank = int(os.environ.get('LOCAL_RANK', 0))
+
+    if world_size > 1:
+        torch.cuda.set_device(rank)
+        dist.init_process_group('nccl')
+
+    try:
+        main_worker(args, rank, world_size)
+    finally:
+        if world_size > 1:
+            dist.destroy_process_group()
+
+def main_worker(args: argparse.Namespace, rank: int, world_size: int):
+    """单个训练进程，多卡时每张卡运行一个"""
+    distributed = world_size > 1
+
+    # 只有主进程输出日志
+    if distributed and dist.get_rank() != 0:
+        logger.setLevel(logging.WARNING)
+
     # 设置设备
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    device = torch.device('cuda', rank) if torch.cuda.is_available() else torch.device('cpu')
     logger.info(f"使用设备: {device}")
 
     # 检查GPU
@@ -205,32 +315,58 @@ def main():
     # 数据处理
     logger.info("开始数据处理...")
     processor = DataProcessor()
-    df = processor.load_data(args.data)
+    cached = processor.load_cache(args.data)
 
-    if df.empty:
-        logger.error("数据加载失败")
-        return
+    if cached is not None:
+        X, y = cached
+    else:
+        df = processor.load_data(args.data)
+
+        if df.empty:
+            logger.error("数据加载失败")
+            return
+
+        X, y = processor.preprocess_data(df)
+        if not distributed or dist.get_rank() == 0:
+            processor.save_cache(args.data, X, y)
 
-    X, y = processor.preprocess_data(df)
     X_train, X_val, X_test, y_train, y_val, y_test = processor.split_data(X, y)
 
-    # 创建数据集
-    train_features = processor.create_features_dict(X_train)
-    val_features = processor.create_features_dict(X_val)
-    test_features = processor.create_features_dict(X_test)
+    config = TrainingConfig()
 
-    train_dataset = PhishingDataset(train_features, y_train)
-    val_dataset = PhishingDataset(val_features, y_val)
-    test_dataset = PhishingDataset(test_features, y_test)
+    # 创建数据集
+    # bf16混合精度训练时特征以bfloat16存储，主机到GPU的拷贝量减半
+    use_bf16 = (torch.cuda.is_available() and config.training_config['amp_dtype'] != 'fp16'
+                and not args.fp32_cache)
+    feature_dtype = torch.bfloat16 if use_bf16 else torch.float32
+    train_dataset = PhishingDataset(*processor.to_tensors(X_train, y_train, feature_dtype))
+    val_dataset = PhishingDataset(*processor.to_tensors(X_val, y_val, feature_dtype))
+    test_dataset = PhishingDataset(*processor.to_tensors(X_test, y_test, feature_dtype))
 
     # 创建数据加载器
-    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True, num_workers=4)
-    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False, num_workers=4)
-    test_loader = DataLoader(test_dataset, batch_size=args.batch_size, shuffle=False, num_workers=4)
+    if torch.cuda.is_available() and args.loader == 'gpu':
+        # 数据集整体常驻显存，直接按索引取批次，不经过DataLoader和主机到GPU拷贝
+        shard = dict(rank=dist.get_rank(), world_size=world_size) if distributed else {}
+        # 丢弃最后不完整的批次，保持形状固定，避免torch.compile重新编译
+        train_loader = GPUTensorLoader(train_dataset, args.batch_size, shuffle=True, drop_last=True,
+                                       device=device, **shard)
+        val_loader = GPUTensorLoader(val_dataset, args.batch_size, device=device, **shard)
+        test_loader = GPUTensorLoader(test_dataset, args.batch_size, device=device)
+    else:
+        # 样本只是张量切片，在主进程中加载（num_workers=0），省去worker启动和进程间传输
+        # 锁页内存使主机到GPU的拷贝可异步进行
+        loader_kwargs = dict(batch_size=args.batch_size, num_workers=NUM_WORKERS,
+                             pin_memory=torch.cuda.is_available())
+        # 多卡时训练集和验证集按进程分片
+        train_sampler = DistributedSampler(train_dataset, shuffle=True, drop_last=True) if distributed else None
+        val_sampler = DistributedSampler(val_dataset, shuffle=False) if distributed else None
+        train_loader = DataLoader(train_dataset, shuffle=train_sampler is None, sampler=train_sampler,
+                                  drop_last=True, **loader_kwargs)
+        val_loader = DataLoader(val_dataset, shuffle=False, sampler=val_sampler, **loader_kwargs)
+        test_loader = DataLoader(test_dataset, shuffle=False, **loader_kwargs)
 
     # 创建训练器
     logger.info("创建训练器...")
-    config = TrainingConfig()
     config.training_config['batch_size'] = args.batch_size
     config.training_config['num_epochs'] = args.epochs
     config.optimizer_config['lr'] = args.lr
@@ -243,48 +379,37 @@ def main():
 
     trainer.train(train_loader, val_loader)
 
-    training_time = time.time() - start_time
+    # 首个epoch包含编译/追踪时间，不计入训练耗时
+    training_time = time.time() - start_time - trainer.first_epoch_time
+    logger.info(f"首个epoch（含编译）耗时: {trainer.first_epoch_time:.2f} 秒")
     logger.info(f"训练完成，耗时: {training_time:.2f} 秒")
 
+    # 测试集评估只在主进程进行，使用未包装的模型，避免DDP的集合通信
+    if not trainer.is_main_process:
+        return
+    model = trainer.raw_model if distributed else trainer.model
+
     # 评估模型
     logger.info("评估模型...")
     evaluator = ModelEvaluator()
-    metrics = evaluator.evaluate_model(trainer.model, test_loader, device)
+    metrics, test_labels, test_predictions, test_probabilities = evaluator.evaluate_model(model, test_loader, device)
 
     # 打印评估结果
     logger.info("=== 模型评估结果 ===")
     for metric_name, value in metrics.items():
         logger.info(f"{metric_name}: {value:.4f}")
 
-    # 绘制评估图表
-    logger.info("生成评估图表...")
-    test_predictions = []
-    test_labels = []
-    test_probabilities = []
-
-    trainer.model.eval()
-    with torch.no_grad():
-        for batch in test_loader:
-            url_features = batch['url_features'].to(device)
-            html_features = batch['html_features'].to(device)
-            ssl_features = batch['ssl_features'].to(device)
-            labels = batch['label'].to(device)
-
-            outputs = trainer.model(url_features, html_features, ssl_features)
-            probabilities = torch.softmax(outputs, dim=1)[:, 1]
-            _, predicted = torch.max(outputs, 1)
-
-            test_predictions.extend(predicted.cpu().numpy())
-            test_labels.extend(labels.cpu().numpy())
-            test_probabilities.extend(probabilities.cpu().numpy())
-
-    evaluator.plot_confusion_matrix(np.array(test_labels), np.array(test_predictions))
-    evaluator.plot_roc_curve(np.array(test_labels), np.array(test_probabilities))
+    # 绘制评估图表（复用评估时的预测结果）
+    if not args.no_plots:
+        logger.info("生成评估图表...")
+        evaluator.plot_confusion_matrix(test_labels, test_predictions)
+        evaluator.plot_roc_curve(test_labels, test_probabilities)
 
     # 保存结果
     results = {
         'metrics': metrics,
         'training_time': training_time,
+        'first_epoch_time': trainer.first_epoch_time,
         'model_config': config.model_config,
         'training_config': config.training_config,
         'device': str(device),
@@ -297,12 +422,16 @@ def main():
     with open('training_results.json', 'w', encoding='utf-8') as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
 
+    processor.save_scaler('feature_scaler.pt')
+
     logger.info("✅ 训练完成!")
     logger.info(f"📊 评估指标: {json.dumps(metrics, indent=2, ensure_ascii=False)}")
     logger.info(f"💾 模型保存至: {args.save_model}")
-    logger.info(f"📈 混淆矩阵: confusion_matrix.png")
-    logger.info(f"📈 ROC曲线: roc_curve.png")
+    if not args.no_plots:
+        logger.info(f"📈 混淆矩阵: confusion_matrix.png")
+        logger.info(f"📈 ROC曲线: roc_curve.png")
     logger.info(f"📋 训练结果: training_results.json")
+    logger.info(f"📐 标准化参数: feature_scaler.pt")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
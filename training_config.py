@@ -6,73 +6,178 @@
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel as DDP
 from torch.utils.data import DataLoader, Dataset
+from torch.utils.data.distributed import DistributedSampler
+from torch.utils.checkpoint import checkpoint_sequential
 import transformers
 from transformers import AutoModel, AutoTokenizer
 import numpy as np
 from typing import Dict, List, Any
 import yaml
+import time
+import os
 
 # 4090显卡配置
 DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 GPU_MEMORY = 24  # 4090显存24GB
-BATCH_SIZE = 64  # 根据显存调整
-NUM_WORKERS = 8  # 多进程数据加载
+BATCH_SIZE = 256  # 根据显存调整（融合层使用激活检查点）
+NUM_WORKERS = 0  # 数据集是内存中的张量，切片开销极小，不使用多进程加载
+
+# FP32矩阵乘法走TF32 Tensor Core，cuDNN自动选择最快算法
+torch.set_float32_matmul_precision('high')
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.backends.cudnn.benchmark = True
+
+# 特征分组: 名称 -> (原始宽度, 补零后宽度)，宽度补到8的倍数以便AMP使用Tensor Core
+FEATURE_GROUPS = {
+    'url_features': (50, 56),
+    'html_features': (100, 104),
+    'ssl_features': (20, 24)
+}
+
+def _feature_slices():
+    """补零后各特征分组在特征矩阵中的列范围"""
+    slices = {}
+    start = 0
+    for name, (_, padded_width) in FEATURE_GROUPS.items():
+        slices[name] = slice(start, start + padded_width)
+        start += padded_width
+    return slices
+
+FEATURE_SLICES = _feature_slices()
 
 class PhishingDataset(Dataset):
-    """钓鱼网站数据集"""
-    def __init__(self, features: List[Dict[str, Any]], labels: List[int]):
-        self.features = features
-        self.labels = labels
+    """钓鱼网站数据集（整块特征张量，float32或bfloat16，按行切片取样本）"""
+    def __init__(self, X: torch.Tensor, y: torch.Tensor):
+        self.X = X
+        self.y = y
 
     def __len__(self):
-        return len(self.features)
+        return len(self.X)
 
     def __getitem__(self, idx):
+        row = self.X[idx]
         return {
-            'url_features': torch.tensor(self.features[idx]['url_features'], dtype=torch.float),
-            'html_features': torch.tensor(self.features[idx]['html_features'], dtype=torch.float),
-            'ssl_features': torch.tensor(self.features[idx]['ssl_features'], dtype=torch.float),
-            'label': torch.tensor(self.labels[idx], dtype=torch.long)
+            'url_features': row[FEATURE_SLICES['url_features']],
+            'html_features': row[FEATURE_SLICES['html_features']],
+            'ssl_features': row[FEATURE_SLICES['ssl_features']],
+            'label': self.y[idx]
         }
 
+class GPUTensorLoader:
+    """常驻GPU的批次迭代器：整个数据集放在显存中，按随机索引直接取批次，代替DataLoader"""
+    def __init__(self, dataset: PhishingDataset, batch_size: int, shuffle: bool = False,
+                 drop_last: bool = False, device: torch.device = DEVICE,
+                 rank: int = 0, world_size: int = 1, seed: int = 0):
+        self.X = dataset.X.to(device)
+        self.y = dataset.y.to(device)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        # 多卡时按进程分片，与DistributedSampler的划分方式一致
+        self.rank = rank
+        self.world_size = world_size
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        """设置epoch，打乱顺序由 seed + epoch 决定，各进程一致"""
+        self.epoch = epoch
+
+    def _num_samples(self) -> int:
+        """当前进程每个epoch的样本数"""
+        n = len(self.y)
+        if self.drop_last:
+            return n // self.world_size
+        return (n + self.world_size - 1) // self.world_size
+
+    def __len__(self):
+        num_samples = self._num_samples()
+        if self.drop_last:
+            return num_samples // self.batch_size
+        return (num_samples + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        n = len(self.y)
+        if self.shuffle:
+            generator = torch.Generator(device=self.y.device)
+            generator.manual_seed(self.seed + self.epoch)
+            idx = torch.randperm(n, generator=generator, device=self.y.device)
+        else:
+            idx = torch.arange(n, device=self.y.device)
+
+        if self.world_size > 1:
+            # 不丢弃时循环补齐到进程数的整数倍
+            total = self._num_samples() * self.world_size
+            if total > n:
+                idx = torch.cat([idx, idx[:total - n]])
+            idx = idx[self.rank:total:self.world_size]
+
+        for batch_idx in idx.split(self.batch_size):
+            if self.drop_last and len(batch_idx) < self.batch_size:
+                break
+            rows = self.X[batch_idx]
+            yield {
+                'url_features': rows[:, FEATURE_SLICES['url_features']],
+                'html_features': rows[:, FEATURE_SLICES['html_features']],
+                'ssl_features': rows[:, FEATURE_SLICES['ssl_features']],
+                'label': self.y[batch_idx]
+            }
+
+@torch.jit.script
+def val_step(logits: torch.Tensor, labels: torch.Tensor, label_smoothing: float):
+    """验证批次的损失和正确数，均以张量返回（不触发同步）"""
+    loss = F.cross_entropy(logits, labels, label_smoothing=label_smoothing)
+    correct = (logits.argmax(1) == labels).sum()
+    return loss, correct
+
+class BlockDiagonalLinear(nn.Linear):
+    """分块对角全连接层: 多个互不相连的分支合并为一次GEMM"""
+
+    def __init__(self, in_sizes: List[int], out_sizes: List[int]):
+        super().__init__(sum(in_sizes), sum(out_sizes))
+        mask = torch.zeros(self.out_features, self.in_features)
+
+        with torch.no_grad():
+            self.weight.zero_()
+            row = col = 0
+            for in_size, out_size in zip(in_sizes, out_sizes):
+                # 每个块按独立 nn.Linear(in_size, out_size) 的默认方式初始化
+                block = nn.Linear(in_size, out_size)
+                self.weight[row:row + out_size, col:col + in_size] = block.weight
+                self.bias[row:row + out_size] = block.bias
+                mask[row:row + out_size, col:col + in_size] = 1
+                row += out_size
+                col += in_size
+
+        self.register_buffer('mask', mask, persistent=False)
+
+    def forward(self, x):
+        return F.linear(x, self.weight * self.mask, self.bias)
+
 class AdvancedPhishingDetector(nn.Module):
     """高级钓鱼网站检测器 - 针对4090优化"""
 
     def __init__(self, config: Dict[str, Any]):
         super().__init__()
 
-        # URL处理分支
-        self.url_embedding = nn.Sequential(
-            nn.Linear(50, 256),
+        # URL / HTML / SSL 三个处理分支，合并为分块对角层，每层一次GEMM
+        # URL: 56->256->512, HTML: 104->256->512, SSL: 24->128->256
+        in_sizes = [config['url_feature_dim'], config['html_feature_dim'], config['ssl_feature_dim']]
+        self.branches = nn.Sequential(
+            BlockDiagonalLinear(in_sizes, [256, 256, 128]),
             nn.ReLU(),
             nn.Dropout(0.3),
-            nn.Linear(256, 512),
+            BlockDiagonalLinear([256, 256, 128], [512, 512, 256]),
             nn.ReLU(),
             nn.Dropout(0.3)
         )
 
-        # HTML特征处理分支
-        self.html_processor = nn.Sequential(
-            nn.Linear(100, 256),
-            nn.ReLU(),
-            nn.Dropout(0.3),
-            nn.Linear(256, 512),
-            nn.ReLU(),
-            nn.Dropout(0.3)
-        )
-
-        # SSL特征处理分支
-        self.ssl_processor = nn.Sequential(
-            nn.Linear(20, 128),
-            nn.ReLU(),
-            nn.Dropout(0.2),
-            nn.Linear(128, 256),
-            nn.ReLU(),
-            nn.Dropout(0.2)
-        )
-
         # 融合层
         self.fusion_layer = nn.Sequential(
             nn.Linear(512 + 512 + 256, 1024),
@@ -87,24 +192,24 @@ class AdvancedPhishingDetector(nn.Module):
             nn.Linear(256, 2)  # 二分类
         )
 
-        # 注意力机制
-        self.attention = nn.MultiheadAttention(embed_dim=512, num_heads=8)
+        # 融合前的残差门控（长度为1的序列上的注意力等价于一次线性变换）
+        self.gate = nn.Sequential(
+            nn.Linear(512 + 512 + 256, 512 + 512 + 256),
+            nn.GELU()
+        )
 
     def forward(self, url_features, html_features, ssl_features):
-        # 处理各分支特征
-        url_out = self.url_embedding(url_features)
-        html_out = self.html_processor(html_features)
-        ssl_out = self.ssl_processor(ssl_features)
-
-        # 特征融合
-        combined = torch.cat([url_out, html_out, ssl_out], dim=1)
+        # 处理各分支特征，输出按 URL / HTML / SSL 顺序拼接
+        combined = self.branches(torch.cat([url_features, html_features, ssl_features], dim=1))
 
-        # 注意力机制
-        attn_out, _ = self.attention(combined.unsqueeze(0), combined.unsqueeze(0), combined.unsqueeze(0))
-        attn_out = attn_out.squeeze(0)
+        # 残差门控
+        combined = combined + self.gate(combined)
 
-        # 最终分类
-        output = self.fusion_layer(attn_out)
+        # 最终分类: 训练时对融合层做激活检查点，反向时重算，以显存换更大的batch
+        if self.training:
+            output = checkpoint_sequential(self.fusion_layer, 2, combined, use_reentrant=False)
+        else:
+            output = self.fusion_layer(combined)
 
         return output
 
@@ -113,9 +218,10 @@ class TrainingConfig:
 
     def __init__(self):
         self.model_config = {
-            'url_feature_dim': 50,
-            'html_feature_dim': 100,
-            'ssl_feature_dim': 20,
+            # 补零后的输入宽度（原始宽度 50/100/20）
+            'url_feature_dim': FEATURE_GROUPS['url_features'][1],
+            'html_feature_dim': FEATURE_GROUPS['html_features'][1],
+            'ssl_feature_dim': FEATURE_GROUPS['ssl_features'][1],
             'hidden_dim': 512,
             'num_classes': 2
         }
@@ -129,7 +235,9 @@ class TrainingConfig:
             'gradient_clip_norm': 1.0,
             'warmup_epochs': 5,
             'mixup_alpha': 0.2,
-            'label_smoothing': 0.1
+            'label_smoothing': 0.1,
+            # 混合精度类型: bf16（默认）或 fp16（不支持bf16的旧GPU，通过环境变量 AMP_DTYPE=fp16 切换）
+            'amp_dtype': os.getenv('AMP_DTYPE', 'bf16')
         }
 
         self.optimizer_config = {
@@ -154,8 +262,9 @@ class TrainingConfig:
             'dropout_rate': 0.3
         }
 
+        # torchrun启动并已初始化进程组时使用DDP
         self.multi_gpu_config = {
-            'use_data_parallel': torch.cuda.device_count() > 1,
+            'use_distributed': dist.is_available() and dist.is_initialized(),
             'num_gpus': torch.cuda.device_count(),
             'sync_batchnorm': True
         }
@@ -166,11 +275,19 @@ class Trainer:
     def __init__(self, config: TrainingConfig):
         self.config = config
         self.device = DEVICE
-        self.model = AdvancedPhishingDetector(config.model_config).to(self.device)
+        # 保留未编译/未包装的模型，用于保存权重
+        self.raw_model = AdvancedPhishingDetector(config.model_config).to(self.device)
+        self.model = self.raw_model
+
+        # TorchInductor编译: 融合逐点算子，CUDA Graphs消除逐算子启动开销（需固定batch形状）
+        if torch.cuda.is_available() and hasattr(torch, 'compile'):
+            self.model = torch.compile(self.model, mode="reduce-overhead", fullgraph=True, dynamic=False)
 
-        # 多GPU支持
-        if config.multi_gpu_config['use_data_parallel']:
-            self.model = nn.DataParallel(self.model)
+        # 多GPU支持: 每个进程一张卡，DDP在编译之后包装
+        self.distributed = config.multi_gpu_config['use_distributed']
+        self.is_main_process = not self.distributed or dist.get_rank() == 0
+        if self.distributed:
+            self.model = DDP(self.model, device_ids=[torch.cuda.current_device()])
 
         # 优化器
         if config.optimizer_config['type'] == 'AdamW':
@@ -179,7 +296,9 @@ class Trainer:
                 lr=config.optimizer_config['lr'],
                 weight_decay=config.optimizer_config['weight_decay'],
                 betas=config.optimizer_config['betas'],
-                eps=config.optimizer_config['eps']
+                eps=config.optimizer_config['eps'],
+                # 所有参数的更新合并为一个CUDA kernel
+                fused=torch.cuda.is_available()
             )
 
         # 学习率调度器
@@ -196,8 +315,9 @@ class Trainer:
             label_smoothing=config.training_config['label_smoothing']
         )
 
-        # 混合精度训练
-        self.scaler = torch.cuda.amp.GradScaler()
+        # 混合精度训练: bf16动态范围与FP32相同，无需损失缩放；fp16时使用GradScaler
+        self.amp_dtype = torch.float16 if config.training_config['amp_dtype'] == 'fp16' else torch.bfloat16
+        self.scaler = torch.cuda.amp.GradScaler() if self.amp_dtype == torch.float16 else None
 
     def train_epoch(self, train_loader: DataLoader) -> float:
         """训练一个epoch"""
@@ -206,31 +326,41 @@ class Trainer:
 
         for batch_idx, batch in enumerate(train_loader):
             # 数据移动到GPU
-            url_features = batch['url_features'].to(self.device)
-            html_features = batch['html_features'].to(self.device)
-            ssl_features = batch['ssl_features'].to(self.device)
-            labels = batch['label'].to(self.device)
+            # 按存储精度（可能为bfloat16）拷贝到设备后再转为float32
+            url_features = batch['url_features'].to(self.device, non_blocking=True).float()
+            html_features = batch['html_features'].to(self.device, non_blocking=True).float()
+            ssl_features = batch['ssl_features'].to(self.device, non_blocking=True).float()
+            labels = batch['label'].to(self.device, non_blocking=True)
 
-            # 梯度清零
-            self.optimizer.zero_grad()
+            # 梯度清零（置为None，省去memset）
+            self.optimizer.zero_grad(set_to_none=True)
 
             # 混合精度训练
-            with torch.cuda.amp.autocast():
+            with torch.autocast(device_type=self.device.type, dtype=self.amp_dtype,
+                                enabled=self.device.type == 'cuda'):
                 outputs = self.model(url_features, html_features, ssl_features)
                 loss = self.criterion(outputs, labels)
 
-            # 反向传播
-            self.scaler.scale(loss).backward()
+            # 反向传播（fp16时先还原梯度缩放，再按真实梯度裁剪）
+            if self.scaler is not None:
+                self.scaler.scale(loss).backward()
+                self.scaler.unscale_(self.optimizer)
+            else:
+                loss.backward()
 
             # 梯度裁剪
             torch.nn.utils.clip_grad_norm_(
                 self.model.parameters(),
-                self.config.training_config['gradient_clip_norm']
+                self.config.training_config['gradient_clip_norm'],
+                foreach=True
             )
 
             # 优化器步骤
-            self.scaler.step(self.optimizer)
-            self.scaler.update()
+            if self.scaler is not None:
+                self.scaler.step(self.optimizer)
+                self.scaler.update()
+            else:
+                self.optimizer.step()
 
             total_loss += loss.item()
 
@@ -239,27 +369,41 @@ class Trainer:
     def validate(self, val_loader: DataLoader) -> Dict[str, float]:
         """验证模型"""
         self.model.eval()
-        total_loss = 0.0
-        correct = 0
+        label_smoothing = float(self.config.training_config['label_smoothing'])
+        total_loss = torch.zeros((), device=self.device)
+        correct = torch.zeros((), dtype=torch.long, device=self.device)
         total = 0
 
         with torch.no_grad():
             for batch in val_loader:
-                url_features = batch['url_features'].to(self.device)
-                html_features = batch['html_features'].to(self.device)
-                ssl_features = batch['ssl_features'].to(self.device)
-                labels = batch['label'].to(self.device)
+                # 按存储精度（可能为bfloat16）拷贝到设备后再转为float32
+                url_features = batch['url_features'].to(self.device, non_blocking=True).float()
+                html_features = batch['html_features'].to(self.device, non_blocking=True).float()
+                ssl_features = batch['ssl_features'].to(self.device, non_blocking=True).float()
+                labels = batch['label'].to(self.device, non_blocking=True)
 
                 outputs = self.model(url_features, html_features, ssl_features)
-                loss = self.criterion(outputs, labels)
+                loss, batch_correct = val_step(outputs, labels, label_smoothing)
 
-                total_loss += loss.item()
-                _, predicted = outputs.max(1)
+                # 累加保留在设备上，整个验证过程只同步一次
+                total_loss += loss
+                correct += batch_correct
                 total += labels.size(0)
-                correct += predicted.eq(labels).sum().item()
+
+        stats = torch.stack([
+            total_loss.double(),
+            correct.double(),
+            torch.tensor(float(total), dtype=torch.float64, device=self.device),
+            torch.tensor(float(len(val_loader)), dtype=torch.float64, device=self.device)
+        ])
+
+        # 各进程只验证了自己的分片，汇总后所有进程得到相同的指标（保证早停决策一致）
+        if self.distributed:
+            dist.all_reduce(stats)
+        total_loss, correct, total, num_batches = stats.tolist()
 
         accuracy = 100. * correct / total
-        avg_loss = total_loss / len(val_loader)
+        avg_loss = total_loss / num_batches
 
         return {
             'val_loss': avg_loss,
@@ -270,10 +414,20 @@ class Trainer:
         """完整训练流程"""
         best_val_accuracy = 0.0
         patience_counter = 0
+        self.first_epoch_time = 0.0
 
         for epoch in range(self.config.training_config['num_epochs']):
-            # 训练
+            # GPU迭代器和分布式采样器每个epoch重新打乱
+            if isinstance(train_loader, GPUTensorLoader):
+                train_loader.set_epoch(epoch)
+            elif isinstance(train_loader.sampler, DistributedSampler):
+                train_loader.sampler.set_epoch(epoch)
+
+            # 训练（首个epoch包含编译时间，单独记录）
+            epoch_start = time.time()
             train_loss = self.train_epoch(train_loader)
+            if epoch == 0:
+                self.first_epoch_time = time.time() - epoch_start
 
             # 验证
             val_metrics = self.validate(val_loader)
@@ -281,27 +435,31 @@ class Trainer:
             # 学习率调整
             self.scheduler.step()
 
-            # 打印进度
-            print(f'Epoch [{epoch+1}/{self.config.training_config["num_epochs"]}]')
-            print(f'Train Loss: {train_loss:.4f}')
-            print(f'Val Loss: {val_metrics["val_loss"]:.4f}')
-            print(f'Val Accuracy: {val_metrics["val_accuracy"]:.2f}%')
-            print(f'LR: {self.scheduler.get_last_lr()[0]:.6f}')
-            print('-' * 50)
+            # 打印进度（仅主进程）
+            if self.is_main_process:
+                print(f'Epoch [{epoch+1}/{self.config.training_config["num_epochs"]}]')
+                print(f'Train Loss: {train_loss:.4f}')
+                print(f'Val Loss: {val_metrics["val_loss"]:.4f}')
+                print(f'Val Accuracy: {val_metrics["val_accuracy"]:.2f}%')
+                print(f'LR: {self.scheduler.get_last_lr()[0]:.6f}')
+                print('-' * 50)
 
             # 早停
             if val_metrics['val_accuracy'] > best_val_accuracy:
                 best_val_accuracy = val_metrics['val_accuracy']
                 patience_counter = 0
-                # 保存最佳模型
-                torch.save(self.model.state_dict(), 'best_model.pth')
+                # 保存最佳模型（仅主进程）
+                if self.is_main_process:
+                    torch.save(self.raw_model.state_dict(), 'best_model.pth')
             else:
                 patience_counter += 1
                 if patience_counter >= self.config.training_config['early_stopping_patience']:
-                    print(f'Early stopping at epoch {epoch+1}')
+                    if self.is_main_process:
+                        print(f'Early stopping at epoch {epoch+1}')
                     break
 
-        print(f'Best validation accuracy: {best_val_accuracy:.2f}%')
+        if self.is_main_process:
+            print(f'Best validation accuracy: {best_val_accuracy:.2f}%')
 
 def create_training_pipeline():
     """创建训练流水线"""
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+"""
+WSGI入口，供生产服务器加载
+
+gunicorn --preload -k gthread -w 4 --threads 4 -t 30 -b 0.0.0.0:5000 wsgi:application
+"""
+
+from simple_app import app
+
+application = app